@@ -1,96 +1,84 @@
 import pandas as pd
 from datetime import timedelta
 import numpy as np
-import warnings
-warnings.filterwarnings('ignore')
 
-def calc_diff(group):
-    row1 = group.iloc[0].copy()
-    endtime = group.iloc[-1]['time_rep']
-    starttime = row1['time_rep']
-    diff = endtime-starttime
-    row1['diff'] = diff
-    return row1
-
-def collapse_bool_array(df, bool_array):
-    unique_num = bool_array.ne(bool_array.shift()).cumsum()
-    number_consec = unique_num.map(unique_num.value_counts()).where(bool_array)
-    df_unique = pd.DataFrame({'time_rep': df['time'], 'glc_rep':
-                            df['glc'], 'unique_number': unique_num,
-                            'consec_readings': number_consec})
-    df_unique['time_rep'] = pd.to_datetime(df_unique['time_rep'])
-    # Drop any null glucose readings and reset index
-    df_unique.dropna(subset=['glc_rep'], inplace=True)
-    df_unique.reset_index(inplace=True, drop=True)
-    diff = df_unique.groupby('unique_number').apply((lambda group: calc_diff(group)), include_groups=False)
-    diff = diff.drop(columns=['glc_rep'])#.reset_index()
-    return diff
+def collapse_bool_array(df, bool_array, codes):
+    # Give a unique number to every run of consecutive True or False values, starting
+    # a new run wherever the group changes so runs never cross from one group to the next
+    flags = bool_array.to_numpy(dtype=bool)
+    unique_num = np.cumsum(np.concatenate(([True], (flags[1:] != flags[:-1]) | (codes[1:] != codes[:-1]))))
+    # Drop any null glucose readings, so a run of only null readings disappears
+    valid = df['glc'].notnull().to_numpy()
+    unique_num = unique_num[valid]
+    flags = flags[valid]
+    codes = codes[valid]
+    times = df['time'].to_numpy()[valid]
+    if unique_num.size == 0:
+        return pd.DataFrame({'time_rep': times, 'event': flags, 'diff': times - times, 'code': codes})
+    # Positions of the first and last reading of each run
+    first = np.flatnonzero(np.concatenate(([True], unique_num[1:] != unique_num[:-1])))
+    last = np.concatenate((first[1:], [unique_num.size])) - 1
+    # One row per run with its start time, whether it's an event, its duration and its group
+    return pd.DataFrame({'time_rep': times[first], 'event': flags[first],
+                         'diff': times[last] - times[first], 'code': codes[first]})
 
 def calc_duration(unique_min, mins):
     # Only keep hypos that are 15 mins or longer (smaller than this doesn't count)
     results = unique_min[unique_min['diff'] >= timedelta(minutes=mins)].copy()
 
-    # Fill the consec readings with binary value to show whether they are hypos or
-    # the periods between hypos
-    results['consec_readings'] = results['consec_readings'].fillna(-1)
-    results['event'] = results['consec_readings'] > 0
-
     # Merge any consecutive values left by removal of too-short episodes using
-    # a new unique number
-    results['unique'] = results['event'].ne(results['event'].shift()).cumsum()
+    # a new unique number, without merging across groups
+    results['unique'] = (results['event'].ne(results['event'].shift()) |
+                         results['code'].ne(results['code'].shift())).cumsum()
     return results
 
 def merge_events(results, mins):
-    # Group by the unique number, select the min values and select relevant columns
-    results_grouped = results.groupby('unique').min()[['time_rep',  'event', 'diff']].copy() #'glc_rep',
-    results_grouped['diff2'] = results_grouped['time_rep'].diff().shift(-1)
-    # Drop the non-hypo periods and then drop the hypo column
-    final_results = results_grouped.loc[results_grouped['event'] ==
-                                        True].drop(columns=['event'])
-                                        # Rename columns
-    final_results.columns = ['start_time',  'initial_duration', 'duration'] # 'min_glc',
-
-    # Fill final hypo with previous duration value in diff col then drop initial
-    # duration
-    final_results['duration'] = final_results['duration'].fillna(final_results['initial_duration'])
-    final_results.drop(columns=['initial_duration'], inplace=True)
-    # Drop the final column if it's less than 15 mins
-    final_results = final_results.loc[final_results['duration']>=
-                                        timedelta(minutes=mins)]
+    # Positions of the first row of each unique number, which are consecutive runs of rows
+    unique = results['unique'].to_numpy()
+    first = np.flatnonzero(np.concatenate(([True], unique[1:] != unique[:-1])))[:unique.size]
+    times = results['time_rep'].to_numpy()
+    diffs = results['diff'].to_numpy()
+    if unique.size:
+        # Min values of each unique number, skipping missing times like groupby().min()
+        times = np.fmin.reduceat(times, first)
+        diffs = np.fmin.reduceat(diffs, first)
+    events = results['event'].to_numpy()[first]
+    codes = results['code'].to_numpy()[first]
+    # Time until the next run of the same group, missing for the last run of each group
+    diff2 = np.full(first.size, np.timedelta64('NaT'), dtype=diffs.dtype)
+    same_group = codes[1:] == codes[:-1]
+    diff2[:-1][same_group] = (times[1:] - times[:-1])[same_group]
+    # Fill final hypo with previous duration value in diff col
+    duration = np.where(np.isnat(diff2), diffs, diff2)
+    # Drop the non-hypo periods and any that are less than 15 mins
+    keep = events & (duration >= np.timedelta64(timedelta(minutes=mins)))
+    final_results = pd.DataFrame({'start_time': times[keep], 'code': codes[keep], 'duration': duration[keep]})
     final_results['end_time'] = final_results['start_time'] + final_results['duration']
-    # Reset index
-    final_results.reset_index(drop=True, inplace=True)
     return final_results
 
-def overlap(row, lv2_events):
-    for index, row_lv2 in lv2_events.iterrows():
-        if row['start_time'] <= row_lv2['time_rep'] <= row['end_time']:
-            return [True, row_lv2['prolonged']]
-    else:
-        return [False, False]
-
-def calculate_episodes(df, hypo, thresh, thresh_lv2, mins, long_mins):
-    if hypo:
-        bool_array = df['glc'] < thresh
-        bool_array_lv2 = df['glc'] < thresh_lv2
-    else:
-        bool_array = df['glc'] > thresh
-        bool_array_lv2 = df['glc'] > thresh_lv2
-
-    # All events
-    unique_min = collapse_bool_array(df, bool_array)
-    results = calc_duration(unique_min, mins)
-    #results_lv2 = calc_duration(unique_min_lv2, mins)
-    final_results = merge_events(results, mins)
-    if final_results.empty:
-        return 0, 0, 0, 0, 0, 0
-    # Level 2 hypos
-    unique_min_lv2 = collapse_bool_array(df, bool_array_lv2)
-    lv2_events = unique_min_lv2.dropna(subset=['consec_readings'])
-    lv2_events = lv2_events[lv2_events['diff']>=timedelta(minutes=mins)]
-    lv2_events['prolonged'] = lv2_events['diff']>=timedelta(minutes=long_mins)
-    final_results[['lv2', 'prolonged']] = final_results.apply(lambda row: overlap(row, lv2_events), axis=1, result_type ='expand')
+def overlap(final_results, lv2_events):
+    # Compare the episodes of each group with every lv2 event of the same group at once; an
+    # episode is lv2 if an lv2 event starts within it and takes the prolonged flag of the
+    # first such event. Both frames are ordered by group so each group is a contiguous block.
+    starts = final_results['start_time'].to_numpy()
+    ends = final_results['end_time'].to_numpy()
+    codes = final_results['code'].to_numpy()
+    lv2_starts = lv2_events['time_rep'].to_numpy()
+    lv2_prolonged = lv2_events['prolonged'].to_numpy()
+    lv2_codes = lv2_events['code'].to_numpy()
+    lv2 = np.zeros(codes.size, dtype=bool)
+    prolonged = np.zeros(codes.size, dtype=bool)
+    for code in np.unique(codes):
+        rows = slice(*np.searchsorted(codes, [code, code + 1]))
+        events = slice(*np.searchsorted(lv2_codes, [code, code + 1]))
+        inside = ((starts[rows, None] <= lv2_starts[events]) &
+                  (lv2_starts[events] <= ends[rows, None]))
+        lv2[rows] = inside.any(axis=1)
+        if lv2[rows].any():
+            prolonged[rows] = lv2[rows] & lv2_prolonged[events][inside.argmax(axis=1)]
+    return lv2, prolonged
 
+def episode_stats(final_results):
     number_of_episodes = final_results.shape[0]
     number_of_lv2 = final_results.lv2.sum()
     number_of_lv1 = number_of_episodes - number_of_lv2
@@ -109,4 +97,36 @@ def calculate_episodes(df, hypo, thresh, thresh_lv2, mins, long_mins):
     else:
         avg_length = np.nan
         total_time = np.nan
-    return number_of_episodes, number_of_lv1, number_of_lv2, prolonged, str(avg_length), str(total_time)
\ No newline at end of file
+    return number_of_episodes, number_of_lv1, number_of_lv2, prolonged, str(avg_length), str(total_time)
+
+def calculate_episodes_by_group(df, codes, n_groups, hypo, thresh, thresh_lv2, mins, long_mins):
+    # The readings of each group must sit in one contiguous block of rows with the
+    # group codes (0 to n_groups - 1) ascending, and the thresholds can be given per row
+    if hypo:
+        bool_array = df['glc'] < thresh
+        bool_array_lv2 = df['glc'] < thresh_lv2
+    else:
+        bool_array = df['glc'] > thresh
+        bool_array_lv2 = df['glc'] > thresh_lv2
+
+    # All events
+    unique_min = collapse_bool_array(df, bool_array, codes)
+    results = calc_duration(unique_min, mins)
+    #results_lv2 = calc_duration(unique_min_lv2, mins)
+    final_results = merge_events(results, mins)
+    if final_results.empty:
+        return [(0, 0, 0, 0, 0, 0)] * n_groups
+    # Level 2 hypos
+    unique_min_lv2 = collapse_bool_array(df, bool_array_lv2, codes)
+    lv2_events = unique_min_lv2[unique_min_lv2['event'] & (unique_min_lv2['diff']>=timedelta(minutes=mins))].copy()
+    lv2_events['prolonged'] = lv2_events['diff']>=timedelta(minutes=long_mins)
+    final_results['lv2'], final_results['prolonged'] = overlap(final_results, lv2_events)
+
+    # Statistics for each group from its block of episodes
+    bounds = np.searchsorted(final_results['code'].to_numpy(), np.arange(n_groups + 1))
+    return [episode_stats(final_results.iloc[lo:hi]) if hi > lo else (0, 0, 0, 0, 0, 0)
+            for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+def calculate_episodes(df, hypo, thresh, thresh_lv2, mins, long_mins):
+    return calculate_episodes_by_group(df, np.zeros(len(df), dtype=np.intp), 1, hypo, thresh, thresh_lv2,
+                                       mins, long_mins)[0]
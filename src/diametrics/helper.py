@@ -1,13 +1,10 @@
 import copy
 import pandas as pd
 import numpy as np
-import scipy
 from scipy import signal
-import warnings
 from datetime import timedelta
 import statistics
 
-warnings.filterwarnings('ignore')
 
 fift_mins = timedelta(minutes=15)
 thirt_mins = timedelta(minutes=30)
@@ -38,25 +35,41 @@ def mage_helper(dataframe, time, glc):
     return pd.DataFrame([[mage_mean]], columns=['mage_mean'])
 
 
+def bin_counts(series, lower, upper):
+    """
+    Counts the readings in each range between consecutive thresholds in one pass, using np.searchsorted to
+    index the range of every reading and np.bincount to count them. Readings on a threshold from lower go
+    in the range above it, readings on a threshold from upper in the range below. Missing readings are
+    counted in an extra last bin so they still add to the length of the series
+    """
+    glc = series.to_numpy(dtype=float)
+    n_bins = len(lower) + len(upper) + 1
+    idx = np.searchsorted(lower, glc, side='right') + np.searchsorted(upper, glc, side='left')
+    idx[np.isnan(glc)] = n_bins
+    return np.bincount(idx, minlength=n_bins + 1)
+
+
 def tir_helper(series):
     """
     Helper function for time in range calculation with normal thresholds. Calculates the percentage of readings within
-    each threshold by divSiding number of readings within range by total length of series
+    each threshold by dividing number of readings within range by total length of series
     """
     df_len = series.size
-    tir_hypo = series.loc[series < 3.9].size * 100 / df_len
+    lv2_hypo, lv1_hypo, norm, lv1_hyper, lv2_hyper, missing = bin_counts(series, [3, 3.9], [10, 13.9])
+
+    tir_hypo = (lv2_hypo + lv1_hypo) * 100 / df_len
 
-    tir_lv1_hypo = (series.loc[(series < 3.9) & (series >= 3)]).size * 100 / df_len
+    tir_lv1_hypo = lv1_hypo * 100 / df_len
 
-    tir_lv2_hypo = series.loc[series < 3].size * 100 / df_len
+    tir_lv2_hypo = lv2_hypo * 100 / df_len
 
-    tir_norm = (series.loc[(series >= 3.9) & (series <= 10)]).size * 100 / df_len
+    tir_norm = norm * 100 / df_len
 
-    tir_hyper = series.loc[series > 10].size * 100 / df_len
+    tir_hyper = (lv1_hyper + lv2_hyper) * 100 / df_len
 
-    tir_lv1_hyper = (series.loc[(series <= 13.9) & (series > 10)]).size * 100 / df_len
+    tir_lv1_hyper = lv1_hyper * 100 / df_len
 
-    tir_lv2_hyper = series.loc[series > 13.9].size * 100 / df_len
+    tir_lv2_hyper = lv2_hyper * 100 / df_len
 
     return [tir_lv2_hypo, tir_lv1_hypo, tir_hypo, tir_norm, tir_hyper, tir_lv1_hyper, tir_lv2_hyper]
 
@@ -66,11 +79,13 @@ def tir_exercise(series):
     Helper function for time in range calculation with exercise thresholds. Same process as function above.
     """
     df_len = series.size
-    tir_hypo_ex = series.loc[series < 5].size * 100 / df_len
+    hypo_ex, norm_ex, hyper_ex, missing = bin_counts(series, [5], [12])
+
+    tir_hypo_ex = hypo_ex * 100 / df_len
 
-    tir_norm_ex = (series.loc[(series >= 5) & (series <= 12)]).size * 100 / df_len
+    tir_norm_ex = norm_ex * 100 / df_len
 
-    tir_hyper_ex = series.loc[series > 12].size * 100 / df_len
+    tir_hyper_ex = hyper_ex * 100 / df_len
 
     return [tir_hypo_ex, tir_norm_ex, tir_hyper_ex]
 
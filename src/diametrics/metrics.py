@@ -2,10 +2,8 @@ import copy
 import pandas as pd
 import numpy as np
 from scipy import signal
-import warnings
 from datetime import timedelta
-import statistics
-from sklearn import metrics
+from joblib import Parallel, delayed
 # ASK MIKE/MICHAEL ABOUT THIS
 #from src.diametrics 
 from diametrics import _glycemic_events_helper, preprocessing
@@ -32,8 +30,152 @@ UNIT_THRESHOLDS = {
     }
 }
 
-    
-def all_standard_metrics(df, units=None, gap_size=5, start_dt=None, end_dt=None, lv1_hypo=None, lv2_hypo=None, lv1_hyper=None, lv2_hyper=None, event_mins=15, event_long_mins=120):
+
+def _split_by_id(df):
+    """
+    Sort the DataFrame by 'ID' once so that the readings of each ID sit in one contiguous block of rows.
+
+    Args:
+        df (pandas.DataFrame): The DataFrame containing an 'ID' column.
+
+    Returns:
+        tuple: The sorted DataFrame, the unique IDs in sorted order and a list with the slice of rows belonging to each ID.
+
+    Note:
+        - Rows with a missing ID are dropped, matching the behaviour of df.groupby('ID').
+        - The sort is stable so readings keep their original order within each ID.
+        - A categorical 'ID' column is factorized from its codes without hashing the IDs again. The IDs then follow the
+          order of the categories and only categories that have readings are returned, as in
+          df.groupby('ID', observed=True).
+    """
+    codes, ids = pd.factorize(df['ID'], sort=True)
+    order = np.argsort(codes, kind='stable')
+    # Missing IDs are coded as -1 and so sort to the front
+    order = order[np.count_nonzero(codes < 0):]
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(codes[codes >= 0], minlength=len(ids)))))
+    slices = [slice(lo, hi) for lo, hi in zip(offsets[:-1], offsets[1:])]
+    return df.iloc[order], ids, slices
+
+
+def _apply_by_id(df, func):
+    """
+    Apply a function returning a Series to the readings of each ID, like df.groupby('ID').apply(func) but over the
+    contiguous blocks of the sorted DataFrame rather than a new DataFrame for every group.
+
+    Args:
+        df (pandas.DataFrame): The DataFrame containing an 'ID' column.
+        func (callable): The function to apply to each ID's readings, which are passed without the 'ID' column.
+
+    Returns:
+        pandas.DataFrame: A DataFrame with an 'ID' column followed by the values returned for each ID.
+    """
+    df, ids, slices = _split_by_id(df)
+    df = df.drop(columns='ID')
+    results = pd.DataFrame([func(df.iloc[s]) for s in slices])
+    results.insert(0, 'ID', ids)
+    return results
+
+
+def _glc_summary(glc):
+    """
+    Calculate the mean, standard deviation and minimum of a block of glucose readings in one pass.
+
+    Args:
+        glc (numpy.ndarray): The glucose readings.
+
+    Returns:
+        numpy.ndarray: The mean, sample standard deviation and minimum of the readings, ignoring missing values.
+
+    Note:
+        - Missing readings are zero-filled and left out of the count exactly as pandas does, so the mean and
+          standard deviation match Series.mean() and Series.std() to the last digit.
+    """
+    mask = np.isnan(glc)
+    count = glc.size - np.count_nonzero(mask)
+    if count == 0:
+        return np.array([np.nan, np.nan, np.nan])
+    values = np.where(mask, 0, glc)
+    avg = values.sum() / count
+    sqr = np.where(mask, 0, (avg - values) ** 2)
+    sd = np.sqrt(sqr.sum() / (count - 1)) if count > 1 else np.nan
+    return np.array([avg, sd, values[~mask].min()])
+
+
+def _summarise_by_id(df):
+    """
+    Calculate the mean, standard deviation and minimum glucose of every ID.
+
+    Args:
+        df (pandas.DataFrame): The DataFrame containing 'ID' and 'glc' columns.
+
+    Returns:
+        tuple: The unique IDs in sorted order and an array with one row of _glc_summary results per ID.
+    """
+    df, ids, slices = _split_by_id(df)
+    glc = df['glc'].to_numpy(dtype=float)
+    return ids, np.array([_glc_summary(glc[s]) for s in slices]).reshape(-1, 3)
+
+
+def _ea1c(avg_glc, min_glc, units=None):
+    """
+    Convert average glucose to estimated HbA1c (eA1c).
+
+    Args:
+        avg_glc (float or numpy.ndarray): The average glucose reading(s).
+        min_glc (float or numpy.ndarray): The minimum glucose reading(s), used to detect the units when they are not given.
+        units (str, optional): The units of the glucose readings, 'mmol' or 'mg'. Defaults to None.
+
+    Returns:
+        float or numpy.ndarray: The eA1c value(s).
+
+    Raises:
+        ValueError: If the units are not supported.
+    """
+    if units is None:
+        # Same check as 'preprocessing.detect_units'
+        mg = min_glc > 35
+    elif units in ('mmol', 'mg'):
+        mg = units == 'mg'
+    else:
+        raise ValueError(f"Unsupported units '{units}'. Supported units are 'mmol' and 'mg'.")
+    return (avg_glc + np.where(mg, 46.7, 2.59)) / np.where(mg, 28.7, 1.59)
+
+
+def _glucose_metrics(df, slices, units=None):
+    """
+    Calculate the metrics that only reduce the glucose readings (average glucose, eA1c, glycemic variability,
+    time in range and GRI) for every block of readings at once.
+
+    Args:
+        df (pandas.DataFrame): The DataFrame containing 'time' and 'glc' columns.
+        slices (list): The slice of rows making up each block, as returned by _split_by_id.
+        units (str, optional): The units of the glucose readings, 'mmol' or 'mg'. If None, they are detected for each block.
+
+    Returns:
+        tuple: Two lists with a dictionary per block, the first holding avg_glc, ea1c, sd and cv and the second the
+        time in range percentages and GRI.
+
+    Note:
+        - Rows with a missing time or glucose value are left out, as they are by all_standard_metrics.
+    """
+    valid = (df['time'].notnull() & df['glc'].notnull()).to_numpy()
+    codes = np.repeat(np.arange(len(slices)), [s.stop - s.start for s in slices])[valid]
+    glc = df['glc'].to_numpy(dtype=float)[valid]
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=len(slices)))))
+
+    # Average glucose, eA1c and glycemic variability from a single pass over each block
+    summary = np.array([_glc_summary(glc[lo:hi]) for lo, hi in zip(offsets[:-1], offsets[1:])]).reshape(-1, 3)
+    summary = pd.DataFrame({'avg_glc': summary[:, 0], 'ea1c': _ea1c(summary[:, 0], summary[:, 2], units),
+                            'sd': summary[:, 1], 'cv': (summary[:, 1] * 100) / summary[:, 0]})
+
+    # Time in ranges of every block in one pass, and the GRI weighted from them
+    ranges = pd.DataFrame(_tir_percentages(glc, codes, len(slices), units))
+    ranges['gri'] = [min(score, 100) for score in _gri_score(ranges)]  # cap to 100
+
+    return summary.to_dict('records'), ranges.to_dict('records')
+
+
+def all_standard_metrics(df, units=None, gap_size=5, start_dt=None, end_dt=None, lv1_hypo=None, lv2_hypo=None, lv1_hyper=None, lv2_hyper=None, event_mins=15, event_long_mins=120, n_jobs=1):
     """
     Calculate standard metrics of glycemic control for glucose data.
 
@@ -47,6 +189,7 @@ def all_standard_metrics(df, units=None, gap_size=5, start_dt=None, end_dt=None,
         additional_tirs (list, optional): Additional time in range thresholds. Defaults to None.
         event_mins (int, optional): Duration in minutes for identifying glycemic events. Defaults to 15.
         event_long_mins (int, optional): Duration in minutes for identifying long glycemic events. Defaults to 120.
+        n_jobs (int, optional): Number of processes used to calculate the metrics of different IDs in parallel, -1 for all cores. Defaults to 1.
 
     Returns:
         DataFrame or dict: Calculated standard metrics as a DataFrame if return_df is True, or as a dictionary if return_df is False.
@@ -55,65 +198,66 @@ def all_standard_metrics(df, units=None, gap_size=5, start_dt=None, end_dt=None,
         Exception: If the input DataFrame fails the data check.
 
     """
-    def run(df, units, gap_size, start_dt, end_dt, lv1_hypo, lv2_hypo, lv1_hyper, lv2_hyper, event_mins, event_long_mins):
-        if preprocessing.check_df(df):
-            results = {}
-            # Drop rows with missing time or glucose values
-            df = df.dropna(subset=['time', 'glc']).reset_index(drop=True)
-            # Amount of data available
-            data_suff = data_sufficiency(df, start_dt, end_dt, gap_size=gap_size)
-            results.update(data_suff)
-            
-            # Average glucose
-            avg_glc_result = average_glc(df)
-            results.update(avg_glc_result)
-
-            # eA1c
-            ea1c_result = ea1c(df, units)
-            results.update(ea1c_result)
-            
-            # Glycemic variability
-            glyc_var = glycemic_variability(df)
-            results.update(glyc_var)
-            
-            # AUC
-            auc_result = auc(df)
-            results.update(auc_result)
-            
-            # LBGI and HBGI
-            bgi_results = bgi(df, units)
-            results.update(bgi_results)
-            
-            # MAGE
-            mage_results = mage(df)
-            results.update(mage_results)
-
-            # Time in ranges
-            ranges = time_in_range(df, units)
-            results.update(ranges)
-
-            # glycemic index (GRI)
-            gri_results = glycemic_risk_index(df, units)
-            results.update(gri_results)
-
-            # New method
-            hypos = glycemic_episodes(df, units, lv1_hypo, lv2_hypo, lv1_hyper, lv2_hyper, event_mins, event_long_mins)
-            results.update(hypos)
-            
-            results = pd.DataFrame(results)
-
-            return results
+    def run(df, summary, ranges, units, gap_size, start_dt, end_dt, lv1_hypo, lv2_hypo, lv1_hyper, lv2_hyper, event_mins, event_long_mins):
+        results = {}
+        # Drop rows with missing time or glucose values
+        df = df.dropna(subset=['time', 'glc']).reset_index(drop=True)
+        # Amount of data available
+        data_suff = data_sufficiency(df, start_dt, end_dt, gap_size=gap_size)
+        results.update(data_suff)
         
-        else:
+        # Average glucose, eA1c and glycemic variability, calculated for every block at once
+        results.update(summary)
+        
+        # AUC
+        auc_result = auc(df)
+        results.update(auc_result.iloc[0])
+        
+        # LBGI and HBGI
+        bgi_results = bgi(df, units)
+        results.update(bgi_results)
+        
+        # MAGE
+        mage_results = mage(df)
+        results.update(mage_results.iloc[0])
+
+        # Time in ranges and glycemic index (GRI), calculated for every block at once
+        results.update(ranges)
+
+        # New method
+        hypos = glycemic_episodes(df, units, lv1_hypo, lv2_hypo, lv1_hyper, lv2_hyper, event_mins, event_long_mins)
+        results.update(hypos)
+
+        # A flat record of scalars, so the rows of every ID are assembled into one DataFrame at the end
+        return results
+
+    def check(df):
+        # Check the readings before any metric is calculated from them
+        if not preprocessing.check_df(df):
             raise Exception("Data check failed. Please ensure the input DataFrame is valid.")
     
+    # Convert the time column once so that none of the metrics has to parse it again
+    if not pd.api.types.is_datetime64_any_dtype(df['time']):
+        df = copy.copy(df)
+        df['time'] = pd.to_datetime(df['time'])
+
     if 'ID' in df.columns:
-        results = df.groupby('ID').apply((lambda group: run(group, units, gap_size, start_dt, end_dt, lv1_hypo, lv2_hypo, lv1_hyper, lv2_hyper, event_mins, event_long_mins)), include_groups=False)
-        results = pd.DataFrame(results).reset_index().drop(columns='level_1')
+        # Sort by 'ID' once and hand each contiguous block of readings to every metric in turn
+        df, ids, slices = _split_by_id(df)
+        df = df.drop(columns='ID')
+        for s in slices:
+            check(df.iloc[s])
+        summaries, ranges = _glucose_metrics(df, slices, units)
+        # The IDs are independent of each other so their blocks can be processed in parallel
+        rows = Parallel(n_jobs=n_jobs)(delayed(run)(df.iloc[s], summary, tir, units, gap_size, start_dt, end_dt, lv1_hypo, lv2_hypo, lv1_hyper, lv2_hyper, event_mins, event_long_mins) for s, summary, tir in zip(slices, summaries, ranges))
+        results = pd.DataFrame(rows)
+        results.insert(0, 'ID', ids)
+        return results
+    else:
+        check(df)
+        summaries, ranges = _glucose_metrics(df, [slice(0, len(df))], units)
+        results = pd.DataFrame([run(df, summaries[0], ranges[0], units, gap_size, start_dt, end_dt, lv1_hypo, lv2_hypo, lv1_hyper, lv2_hyper, event_mins, event_long_mins)])
         return results
-    else:    
-        results = run(df, units, gap_size, start_dt, end_dt, lv1_hypo, lv2_hypo, lv1_hyper, lv2_hyper, event_mins, event_long_mins)
-        return results    
     
 
 def average_glc(df):
@@ -126,18 +270,14 @@ def average_glc(df):
     Returns:
         pandas.DataFrame: A DataFrame containing the average glucose reading.
     """
-    def run(group):
-        # Calculate the mean of the 'glc' column in the DataFrame
-        average = group['glc'].mean()
-        return pd.Series({'avg_glc': average})
-    
     if 'ID' in df.columns:
-        # Group by 'ID' and apply the run function, ensuring the output is a DataFrame
-        results = df.groupby('ID').apply(run, include_groups=False).reset_index()
-    else:    
-        # Apply function directly and convert the resulting Series to a DataFrame
-        results = run(df)
-        results = pd.DataFrame([results])  # Convert Series to a single-row DataFrame
+        # Summarise each ID's contiguous block of readings
+        ids, summary = _summarise_by_id(df)
+        results = pd.DataFrame({'ID': ids, 'avg_glc': summary[:, 0]})
+    else:
+        # Summarise all readings straight into a single-row DataFrame
+        avg_glc, _, _ = _glc_summary(df['glc'].to_numpy(dtype=float))
+        results = pd.DataFrame({'avg_glc': [avg_glc]})
 
     return results
 
@@ -170,8 +310,8 @@ def percentiles(df):
         return pd.Series(percentiles, index=labels)
 
     if 'ID' in df.columns:
-        # Group by 'ID' and apply the run function, ensuring the output is a DataFrame
-        results = df.groupby('ID').apply(run, include_groups=False).reset_index()
+        # Apply the run function to each ID's block of readings, ensuring the output is a DataFrame
+        results = _apply_by_id(df, run)
     else:
         # Apply function directly and convert the resulting Series to a DataFrame
         results = run(df)
@@ -191,23 +331,14 @@ def glycemic_variability(df):
     Returns:
         pandas.DataFrame: A DataFrame containing the calculated glycemic variability metrics.
     """
-
-    def run(group):
-        avg_glc = group['glc'].mean()
-        sd = group['glc'].std()
-        cv = (sd * 100) / avg_glc
-        return pd.Series({
-            'sd': sd,
-            'cv': cv
-        })
-
     if 'ID' in df.columns:
-        # Apply run function and convert Series to DataFrame
-        results = df.groupby('ID').apply(run, include_groups=False).reset_index()
+        # Summarise each ID's contiguous block of readings
+        ids, summary = _summarise_by_id(df)
+        results = pd.DataFrame({'ID': ids, 'sd': summary[:, 1], 'cv': (summary[:, 1] * 100) / summary[:, 0]})
     else:
-        # Apply run function to the whole DataFrame without grouping
-        results = run(df)
-        results = pd.DataFrame([results])  # Convert Series to a single-row DataFrame
+        # Summarise all readings straight into a single-row DataFrame
+        avg_glc, sd, _ = _glc_summary(df['glc'].to_numpy(dtype=float))
+        results = pd.DataFrame({'sd': [sd], 'cv': [(sd * 100) / avg_glc]})
 
     return results
 
@@ -223,30 +354,14 @@ def ea1c(df, units=None):
     Returns:
         pandas.DataFrame: A DataFrame containing the estimated average HbA1c (eA1c) value.
     """
-    def run(group, units):
-        avg_glc = group['glc'].mean()
-
-        # Check the units of glucose readings if not provided
-        if units is None:
-            units = preprocessing.detect_units(group)  # Assuming 'preprocessing.detect_units' is implemented
-        
-        # Determine the eA1c based on units
-        if units == 'mmol':
-            ea1c_result = (avg_glc + 2.59) / 1.59
-        elif units == 'mg':
-            ea1c_result = (avg_glc + 46.7) / 28.7
-        else:
-            raise ValueError(f"Unsupported units '{units}'. Supported units are 'mmol' and 'mg'.")
-
-        return pd.Series({'ea1c': ea1c_result})
-    
     if 'ID' in df.columns:
-        # Group by 'ID' and apply the run function, pass units to the function
-        results = df.groupby('ID').apply(run, units=units, include_groups=False).reset_index()
+        # Summarise each ID's contiguous block of readings, detecting the units per ID if not provided
+        ids, summary = _summarise_by_id(df)
+        results = pd.DataFrame({'ID': ids, 'ea1c': _ea1c(summary[:, 0], summary[:, 2], units)})
     else:
-        # Apply function directly and convert the resulting Series to a DataFrame
-        results = run(df, units)
-        results = pd.DataFrame([results])  # Convert Series to a single-row DataFrame
+        # Summarise all readings straight into a single-row DataFrame, detecting the units if not provided
+        avg_glc, _, min_glc = _glc_summary(df['glc'].to_numpy(dtype=float))
+        results = pd.DataFrame({'ea1c': [_ea1c(avg_glc, min_glc, units)]})
 
     return results
 
@@ -281,8 +396,8 @@ def auc(df):
     df = df.dropna(subset=['time', 'glc'])
 
     if 'ID' in df.columns:
-        # Apply the run function to each group and include include_groups=False
-        results = df.groupby('ID').apply(run, include_groups=False).reset_index()
+        # Apply the run function to each ID's block of readings
+        results = _apply_by_id(df, run)
     else:
         # Apply function directly and convert the resulting Series to a DataFrame
         results = run(df)
@@ -321,7 +436,7 @@ def mage(df):
 
     df = df.dropna(subset=['time', 'glc'])  # Work on a copy of the DataFrame to avoid modifying the original
     if 'ID' in df.columns:
-        results = df.groupby('ID').apply(run, include_groups=False).reset_index()
+        results = _apply_by_id(df, run)
     else:
         results = run(df)
         results = pd.DataFrame([results])  # Convert Series to a single-row DataFrame
@@ -329,6 +444,57 @@ def mage(df):
     return results
 
 
+def _tir_percentages(glc, codes, n_groups, units=None):
+    """
+    Calculate the time in range percentages of several groups of readings in a single pass.
+
+    Args:
+        glc (numpy.ndarray): The glucose readings.
+        codes (numpy.ndarray): The group of each reading, as an integer code from 0 to n_groups - 1.
+        n_groups (int): The number of groups.
+        units (str, optional): The units of the glucose readings, 'mmol' or 'mg'. If None, they are detected for each group.
+
+    Returns:
+        dict: The percentage of readings within each threshold range, as an array with one value per group.
+
+    Note:
+        - Each reading is given the index of the range it falls in and the indexes are counted with a single np.bincount.
+        - Missing readings count towards the length of the series but fall in no range.
+    """
+    if units is None:
+        # Same check as 'preprocessing.detect_units', applied to each group
+        group_min = pd.Series(glc).groupby(codes, sort=False).min().reindex(range(n_groups)).to_numpy()
+        group_mg = group_min > 35
+    elif units in UNIT_THRESHOLDS:
+        group_mg = np.full(n_groups, units == 'mg')
+    else:
+        raise ValueError(f"Unsupported units '{units}'. Supported units are 'mmol' and 'mg'.")
+
+    # Readings on a hypo threshold belong to the range above it and readings on the other thresholds to
+    # the range below, giving an index from 0 (lv2 hypo) to 5 (lv2 hyper) with 6 for missing readings.
+    # The index is held as int8 and the thresholds as scalars so only one byte per reading is written.
+    keys = ['hypo_lv2', 'hypo_lv1', 'norm_tight', 'hyper_lv1', 'hyper_lv2']
+    bins = np.empty(len(glc), dtype=np.int8)
+    unit_systems = np.unique(group_mg)
+    for is_mg in unit_systems:
+        rows = slice(None) if len(unit_systems) == 1 else group_mg[codes] == is_mg
+        lv2_hypo, lv1_hypo, norm_tight, lv1_hyper, lv2_hyper = (UNIT_THRESHOLDS['mg' if is_mg else 'mmol'][key] for key in keys)
+        series = glc[rows]
+        bins[rows] = np.where(np.isnan(series), 6, (series >= lv2_hypo).astype(np.int8) + (series >= lv1_hypo)
+                              + (series > norm_tight) + (series > lv1_hyper) + (series > lv2_hyper))
+    counts = np.bincount(codes * 7 + bins, minlength=n_groups * 7).reshape(n_groups, 7)
+    df_len = counts.sum(axis=1)
+
+    return {
+        'tir_normal': (counts[:, 2] + counts[:, 3]) / df_len * 100,
+        'tir_norm_tight': counts[:, 2] / df_len * 100,
+        'tir_lv1_hypo': counts[:, 1] / df_len * 100,
+        'tir_lv2_hypo': counts[:, 0] / df_len * 100,
+        'tir_lv1_hyper': counts[:, 4] / df_len * 100,
+        'tir_lv2_hyper': counts[:, 5] / df_len * 100
+    }
+
+
 def time_in_range(df, units=None):
     """
     Helper function for time in range calculation with normal thresholds. Calculates the percentage of readings within
@@ -350,62 +516,27 @@ def time_in_range(df, units=None):
         - TIR level 1 hyperglycemia represents the percentage of readings within the range (10, 13.9].
         - TIR level 2 hyperglycemia represents the percentage of readings above 13.9.
     """
-    def run(df, units):
-        # Convert input series to NumPy array for vectorized calculations
-        series = np.array(df['glc']) 
-        # Get length of the series
-        df_len = len(series)
-
-        # Check the units of glucose readings if not provided
-        if units is None:
-            units = preprocessing.detect_units(df)  # Assuming 'preprocessing.detect_units' is implemented
-        
-        # Use this to get the thresholds from the global dictionary
-        thresholds = UNIT_THRESHOLDS.get(units, {})
-        norm_tight = thresholds.get('norm_tight')
-        hypo_lv1 = thresholds.get('hypo_lv1')
-        hypo_lv2 = thresholds.get('hypo_lv2')
-        hyper_lv1 = thresholds.get('hyper_lv1')
-        hyper_lv2 = thresholds.get('hyper_lv2')
-
-        # Calculate the percentage of readings within each threshold range
-        tir_norm = np.sum((series >= hypo_lv1) & (series <= hyper_lv1)) / df_len * 100
-        tir_norm_1 = np.sum((series >= hypo_lv1) & (series <= norm_tight)) / df_len * 100
-        #tir_norm_2 = np.around(np.sum((series >= norm_tight) & (series <= hyper_lv1)) / df_len * 100, decimals=2)
-        tir_lv1_hypo = np.sum((series < hypo_lv1) & (series >= hypo_lv2)) / df_len * 100
-        tir_lv2_hypo = np.sum(series < hypo_lv2) / df_len * 100
-        tir_lv1_hyper = np.sum((series <= hyper_lv2) & (series > hyper_lv1)) / df_len * 100
-        tir_lv2_hyper = np.sum(series > hyper_lv2) / df_len * 100
-        
-        # Return the calculated values as a dictionary
-        return pd.Series({
-            'tir_normal': tir_norm,
-            'tir_norm_tight': tir_norm_1,
-            #'TIR normal 2 (%)': tir_norm_2,
-            'tir_lv1_hypo': tir_lv1_hypo,
-            'tir_lv2_hypo': tir_lv2_hypo,
-            'tir_lv1_hyper': tir_lv1_hyper,
-            'tir_lv2_hyper': tir_lv2_hyper
-        })
-    
     if 'ID' in df.columns:
-        results = df.groupby('ID').apply((lambda group: run(group, units=units)), include_groups=False).reset_index()        
-        return results
-    else:    
-        results = run(df, units)
+        # Code each reading with its ID and calculate the ranges for every ID in one pass
+        codes, ids = pd.factorize(df['ID'], sort=True)
+        keep = codes >= 0  # Rows with a missing ID are dropped, as in df.groupby('ID')
+        results = pd.DataFrame(_tir_percentages(df['glc'].to_numpy(dtype=float)[keep], codes[keep], len(ids), units))
+        results.insert(0, 'ID', ids)
         return results
+    else:
+        results = _tir_percentages(df['glc'].to_numpy(dtype=float), np.zeros(len(df), dtype=np.intp), 1, units)
+        return pd.Series({key: value[0] for key, value in results.items()})
 
 
-def glycemic_risk_index(df, units=None):
+def _gri_score(tir_results):
     """
-    Calculate the Glycemia Risk Index (GRI) based on glucose readings and time-in-range metrics.
+    Weight the time in range percentages into an uncapped Glycemia Risk Index (GRI) score.
 
     Args:
-        df (pandas.DataFrame): The DataFrame containing a 'glc' column with glucose readings.
-        units (str): The units of glucose readings, 'mmol' for mmol/L or 'mg' for mg/dL.
+        tir_results (pandas.Series or pandas.DataFrame): The output of time_in_range.
 
     Returns:
-        pandas.DataFrame: A DataFrame containing the GRI score.
+        float or pandas.Series: The GRI score of each set of time in range results.
     """
     # Define the GRI weights for each glucose range
     GRI_WEIGHTS = {
@@ -416,40 +547,44 @@ def glycemic_risk_index(df, units=None):
         'severe_hyperglycemia': 0.8 # >250 mg/dL
     }
 
-    # Check the units of glucose readings if not provided
-    if units is None:
-        units = preprocessing.detect_units(df)  # Assuming 'preprocessing.detect_units' is implemented
+    # Extract the relevant percentages
+    severe_hypo = tir_results['tir_lv2_hypo']  # <54 mg/dL
+    hypo = tir_results['tir_lv1_hypo']         # 54–69 mg/dL
+    euglycemia = tir_results['tir_normal']     # 70–180 mg/dL
+    hyper = tir_results['tir_lv1_hyper']       # 181–250 mg/dL
+    severe_hyper = tir_results['tir_lv2_hyper'] # >250 mg/dL
 
-    def run(df, units):
-        # Calculate time-in-range metrics using the existing function
-        tir_results = time_in_range(df, units)
-        
-        # Extract the relevant percentages
-        severe_hypo = tir_results['tir_lv2_hypo']  # <54 mg/dL
-        hypo = tir_results['tir_lv1_hypo']         # 54–69 mg/dL
-        euglycemia = tir_results['tir_normal']     # 70–180 mg/dL
-        hyper = tir_results['tir_lv1_hyper']       # 181–250 mg/dL
-        severe_hyper = tir_results['tir_lv2_hyper'] # >250 mg/dL
-
-        # Calculate the GRI score based on weights
-        gri_score = min(
-            (severe_hypo * GRI_WEIGHTS['severe_hypoglycemia']) +
+    # Calculate the GRI score based on weights
+    return ((severe_hypo * GRI_WEIGHTS['severe_hypoglycemia']) +
             (hypo * GRI_WEIGHTS['hypoglycemia']) +
             (euglycemia * GRI_WEIGHTS['euglycemia']) +
             (hyper * GRI_WEIGHTS['hyperglycemia']) +
-            (severe_hyper * GRI_WEIGHTS['severe_hyperglycemia']), 
-            100)  # cap to 100
-        
-        return pd.Series({'gri': gri_score})
+            (severe_hyper * GRI_WEIGHTS['severe_hyperglycemia']))
+
+
+def glycemic_risk_index(df, units=None):
+    """
+    Calculate the Glycemia Risk Index (GRI) based on glucose readings and time-in-range metrics.
+
+    Args:
+        df (pandas.DataFrame): The DataFrame containing a 'glc' column with glucose readings.
+        units (str): The units of glucose readings, 'mmol' for mmol/L or 'mg' for mg/dL.
+
+    Returns:
+        pandas.DataFrame: A DataFrame containing the GRI score.
+    """
+    # Check the units of glucose readings if not provided
+    if units is None:
+        units = preprocessing.detect_units(df)  # Assuming 'preprocessing.detect_units' is implemented
 
     if 'ID' in df.columns:
-        # Apply the function to each group if the DataFrame is grouped by 'ID'
-        results = df.groupby('ID').apply((lambda group: run(group, units=units)), include_groups=False).reset_index()
+        # Calculate the time in range of every ID at once and weight the columns
+        tir_results = time_in_range(df, units)
+        results = pd.DataFrame({'ID': tir_results['ID'], 'gri': _gri_score(tir_results).clip(upper=100)})  # cap to 100
         return results
     else:
-        # Apply the function directly if there are no groups
-        results = run(df, units)
-        return pd.DataFrame([results])  # Convert to a DataFrame for consistency
+        # Calculate the GRI score directly if there are no groups
+        return pd.DataFrame({'gri': [min(_gri_score(time_in_range(df, units)), 100)]})  # cap to 100
 
 
 
@@ -475,45 +610,62 @@ def glycemic_episodes(df, units=None, hypo_lv1_thresh=None, hypo_lv2_thresh=None
         - The function calculates the statistics of glycemic episodes using the '_glycemic_events_helper.calculate_episodes' helper function.
         - The calculated statistics include the total number, LV1 (Level 1) events, LV2 (Level 2) events, prolonged events, average length, and total time spent in episodes for both hypoglycemic and hyperglycemic events.
     """
-    def run(df, units, hypo_lv1_thresh, hypo_lv2_thresh, hyper_lv1_thresh, hyper_lv2_thresh, mins, long_mins):
+    def thresholds(df, units):
         # Identify the units of the dataframe
         if units is None:
             units = preprocessing.detect_units(df)
 
         # Determine threshold values if not provided
         thresholds = UNIT_THRESHOLDS.get(units, {})
-        hypo_lv1_thresh = hypo_lv1_thresh or thresholds.get('hypo_lv1')
-        hypo_lv2_thresh = hypo_lv2_thresh or thresholds.get('hypo_lv2')
-        hyper_lv1_thresh = hyper_lv1_thresh or thresholds.get('hyper_lv1')
-        hyper_lv2_thresh = hyper_lv2_thresh or thresholds.get('hyper_lv2')
+        return (hypo_lv1_thresh or thresholds.get('hypo_lv1'),
+                hypo_lv2_thresh or thresholds.get('hypo_lv2'),
+                hyper_lv1_thresh or thresholds.get('hyper_lv1'),
+                hyper_lv2_thresh or thresholds.get('hyper_lv2'))
 
+    def run(df, codes, n_groups, hypo_lv1_thresh, hypo_lv2_thresh, hyper_lv1_thresh, hyper_lv2_thresh, mins, long_mins):
         # Calculate statistics for hypoglycemic events
-        total_hypos, lv1_hypos, lv2_hypos, prolonged_hypos, avg_length_hypos, total_time_hypos = _glycemic_events_helper.calculate_episodes(df, True, hypo_lv1_thresh, hypo_lv2_thresh, mins, long_mins)
+        hypos = _glycemic_events_helper.calculate_episodes_by_group(df, codes, n_groups, True, hypo_lv1_thresh, hypo_lv2_thresh, mins, long_mins)
 
         # Calculate statistics for hyperglycemic events
-        total_hypers, lv1_hypers, lv2_hypers, prolonged_hypers, avg_length_hypers, total_time_hypers = _glycemic_events_helper.calculate_episodes(df, False, hyper_lv1_thresh, hyper_lv2_thresh, mins, long_mins)
-
-        # Prepare results dictionary
-        results = pd.Series({'number_hypos': total_hypos, 
-                    #'Number LV1 hypoglycemic events': lv1_hypos, 
-                    'number_lv2_hypos':lv2_hypos, 
-                    'number_prolonged_hypos':prolonged_hypos, 
-                    'avg_length_hypos': avg_length_hypos, 
-                    'total_time_in_hypo':total_time_hypos,
-                    'number_hypers':total_hypers, 
-                    #'Number LV1 hyperglycemic events':lv1_hypers,
-                    'number_lv2_hypers':lv2_hypers,
-                    'number_prolonged_hypers':prolonged_hypers, 
-                    'avg_length_hypers':avg_length_hypers,
-                    'total_time_in_hyper':total_time_hypers})
+        hypers = _glycemic_events_helper.calculate_episodes_by_group(df, codes, n_groups, False, hyper_lv1_thresh, hyper_lv2_thresh, mins, long_mins)
+
+        # Prepare results dictionary for each group
+        results = []
+        for (total_hypos, lv1_hypos, lv2_hypos, prolonged_hypos, avg_length_hypos, total_time_hypos), \
+                (total_hypers, lv1_hypers, lv2_hypers, prolonged_hypers, avg_length_hypers, total_time_hypers) in zip(hypos, hypers):
+            results.append({'number_hypos': total_hypos, 
+                        #'Number LV1 hypoglycemic events': lv1_hypos, 
+                        'number_lv2_hypos':lv2_hypos, 
+                        'number_prolonged_hypos':prolonged_hypos, 
+                        'avg_length_hypos': avg_length_hypos, 
+                        'total_time_in_hypo':total_time_hypos,
+                        'number_hypers':total_hypers, 
+                        #'Number LV1 hyperglycemic events':lv1_hypers,
+                        'number_lv2_hypers':lv2_hypers,
+                        'number_prolonged_hypers':prolonged_hypers, 
+                        'avg_length_hypers':avg_length_hypers,
+                        'total_time_in_hyper':total_time_hypers})
         return results
-    
+
+    # Convert the time column once here rather than in every pass of the episode helper,
+    # leaving it untouched if it already holds datetimes
+    if not pd.api.types.is_datetime64_any_dtype(df['time']):
+        df = copy.copy(df)
+        df['time'] = pd.to_datetime(df['time'])
+
     if 'ID' in df.columns:
-        results = df.groupby('ID').apply((lambda group: run(group, units, hypo_lv1_thresh, hypo_lv2_thresh, hyper_lv1_thresh, hyper_lv2_thresh, mins, long_mins)), include_groups=False)
-        return results
+        # Scan all IDs in one pass over the sorted readings, with each ID's readings in a
+        # contiguous block and its thresholds repeated over the rows of its block
+        df, ids, slices = _split_by_id(df)
+        lengths = [s.stop - s.start for s in slices]
+        codes = np.repeat(np.arange(len(ids)), lengths)
+        group_thresholds = np.array([thresholds(df.iloc[s], units) for s in slices]).reshape(len(ids), 4)
+        row_thresholds = np.repeat(group_thresholds, lengths, axis=0).T
+        results = run(df, codes, len(ids), *row_thresholds, mins, long_mins)
+        return pd.DataFrame(results, index=pd.Index(ids, name='ID'))
     else:    
-        results = run(df, units, hypo_lv1_thresh, hypo_lv2_thresh, hyper_lv1_thresh, hyper_lv2_thresh, mins, long_mins)
-        return results
+        results = run(df, np.zeros(len(df), dtype=np.intp), 1, *thresholds(df, units), mins, long_mins)
+        return pd.Series(results[0])
 
 
 def data_sufficiency(df, start_time=None, end_time=None, gap_size=None):
@@ -538,31 +690,23 @@ def data_sufficiency(df, start_time=None, end_time=None, gap_size=None):
         - The gap size must be either 5 or 15. Otherwise, a ValueError is raised.
         - The data sufficiency percentage is calculated as the ratio of non-null values to the total expected values.
     """
-    def run(df, gap_size, start_time, end_time):
-        # Determine start and end time from the DataFrame if not provided
-        start_time = start_time or df['time'].iloc[0]
-        end_time = end_time or df['time'].iloc[-1]
-        days = (end_time-start_time).total_seconds()/86400
+    # Calculate the interval size
+    if gap_size == None:
+        gap_size = df['time'].diff().mode().iloc[0]
+    else:
+        gap_size = timedelta(minutes=gap_size)
 
-        # Subset the DataFrame based on the provided time range
-        df = df.loc[(df['time'] >= start_time) & (df['time'] <= end_time)]
+    # If it doesn't conform to 5 or 15 then don't count it
+    if ((timedelta(minutes=4) < gap_size) & (gap_size < timedelta(minutes=6))):
+        freq = '5min'
+    elif ((timedelta(minutes=14) < gap_size) & (gap_size < timedelta(minutes=16))):
+        freq = '15min'
+    else:
+        raise ValueError('Invalid gap size. Gap size must be 5 or 15.')
 
-        # Calculate the interval size
-        if gap_size == None:
-            df['time'].diff().mode().iloc[0]
-        else:
-            gap_size = timedelta(minutes=gap_size)
-            
-        # If it doesn't conform to 5 or 15 then don't count it
-        if ((timedelta(minutes=4) < gap_size) & (gap_size < timedelta(minutes=6))):
-            freq = '5min'
-        elif ((timedelta(minutes=14) < gap_size) & (gap_size < timedelta(minutes=16))):
-            freq = '15min'
-        else:
-            raise ValueError('Invalid gap size. Gap size must be 5 or 15.')
+    def run(start_time, end_time, number_readings):
+        days = (end_time-start_time).total_seconds()/86400
 
-        # Calculate the number of non-null values
-        number_readings = sum(df.set_index('time').groupby(pd.Grouper(freq=freq)).count()['glc'] > 0)
         # Calculate the total expected readings based on the start and end of the time range
         total_readings = ((end_time - start_time) + gap_size) / gap_size
 
@@ -572,20 +716,42 @@ def data_sufficiency(df, start_time=None, end_time=None, gap_size=None):
         else:
             data_sufficiency = number_readings * 100 / total_readings
 
-
         return pd.Series({
             'start_dt': str(start_time.round('min')),
             'end_dt': str(end_time.round('min')),
             'num_days':days,
             'data_sufficiency': np.round(data_sufficiency, 1)
         })
-    
+
     if 'ID' in df.columns:
-        results = df.groupby('ID').apply((lambda group: run(group, gap_size, start_time, end_time)), include_groups=False).reset_index()
-        return results
-    else:    
-        results = run(df, gap_size, start_time, end_time)
+        # Sort by 'ID' once so each ID's readings form a contiguous block
+        df, ids, slices = _split_by_id(df)
+    else:
+        slices = [slice(0, len(df))]
+
+    # Determine start and end time of each block from the DataFrame if not provided
+    times = df['time']
+    starts = [start_time or times.iloc[s.start] for s in slices]
+    ends = [end_time or times.iloc[s.stop - 1] for s in slices]
+
+    # Subset every block to its time range in one pass
+    lengths = [s.stop - s.start for s in slices]
+    codes = np.repeat(np.arange(len(slices)), lengths)
+    in_range = ((times.to_numpy() >= np.repeat(pd.to_datetime(starts).to_numpy(), lengths)) &
+                (times.to_numpy() <= np.repeat(pd.to_datetime(ends).to_numpy(), lengths)) &
+                df['glc'].notnull().to_numpy())
+
+    # Calculate the number of intervals holding at least one non-null value
+    intervals = times.dt.floor(freq).to_numpy()[in_range]
+    number_readings = pd.Series(intervals).groupby(codes[in_range], sort=False).nunique().reindex(range(len(slices)), fill_value=0)
+
+    results = [run(start, end, n) for start, end, n in zip(starts, ends, number_readings)]
+    if 'ID' in df.columns:
+        results = pd.DataFrame(results)
+        results.insert(0, 'ID', ids)
         return results
+    else:
+        return results[0]
 
 
 def calc_bgi(glucose, units):
@@ -674,7 +840,7 @@ def bgi(df, units=None):
         return pd.Series({'lbgi': lbgi_result, 'hbgi': hbgi_result})
     
     if 'ID' in df.columns:
-        results = df.groupby('ID').apply(run, units=units, include_groups=False).reset_index()        
+        results = _apply_by_id(df, lambda group: run(group, units))
         return results
     else:    
         results = run(df, units)
@@ -66,7 +66,8 @@ def replace_cutoffs(df, remove=False, cap=True, lo_cutoff=2.1, hi_cutoff=22.3):
 
     df = df[pd.to_numeric(df['glc'], errors='coerce').notnull()]
     df['glc'] = pd.to_numeric(df['glc'])
-    df['time'] = pd.to_datetime(df['time'])
+    if not pd.api.types.is_datetime64_any_dtype(df['time']):
+        df['time'] = pd.to_datetime(df['time'])
     df = df.reset_index(drop=True)
     return df
 
@@ -107,7 +108,8 @@ def fill_missing_data(df, interval=5, method='pchip', limit=30, order=5):
     # Create a mask for the limit
     s = df_resampled['glc'].notnull()
     s = s.ne(s.shift()).cumsum()
-    m = df_resampled.groupby([s, df_resampled['glc'].isnull()])['glc'].transform('size').where(df_resampled['glc'].isnull())
+    # Each run is wholly null or not null, so the run number alone is the group key
+    m = df_resampled.groupby(s)['glc'].transform('size').where(df_resampled['glc'].isnull())
     
     # If the method is polynomial or spline, an order needs to be given
     if (method == 'polynomial') | (method == 'spline'):
@@ -149,8 +151,21 @@ def set_time_frame(df, window):
     if isinstance(window, list):
         return df.loc[(df['time']>=window[0])&(df['time']<window[1])]
     elif isinstance(window, dict):
-        conditions = " | ".join(["((df['ID'] == '{0}')&(df['time']>='{1}')&(df['time']<='{2}'))".format(ID, window[0], window[1]) for ID, window in window.items()])
-        cut_df = df[eval(conditions)].reset_index(drop=True)
+        # Sort the ID codes once so the rows of each ID are found with two binary searches
+        # rather than comparing every row with every ID
+        codes, ids = pd.factorize(df['ID'])
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        keep = np.zeros(len(df), dtype=bool)
+        # Look up the code of every ID in the window in one pass
+        window_codes = pd.Index(ids).get_indexer(['{0}'.format(ID) for ID in window])
+        for code, period in zip(window_codes, window.values()):
+            if code < 0:
+                continue
+            rows = order[np.searchsorted(sorted_codes, code, 'left'):np.searchsorted(sorted_codes, code, 'right')]
+            times = df['time'].iloc[rows]
+            keep[rows[((times >= '{0}'.format(period[0])) & (times <= '{0}'.format(period[1]))).to_numpy()]] = True
+        cut_df = df[keep].reset_index(drop=True)
         return cut_df
     else:
         raise ValueError("Invalid type for the 'period' argument. Expected a list or a dictionary.")
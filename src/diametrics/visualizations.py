@@ -190,7 +190,15 @@ def agp(df, ID=None, figure_width=800, figure_height=400):
     df.time = pd.to_datetime(df.time)
     grouped = df.set_index('time').groupby(pd.Grouper(freq='15min')).mean()['glc']
     group_frame = grouped.reset_index().dropna()
-    amb_prof = group_frame.groupby(group_frame['time'].dt.time).apply(lambda group: pd.DataFrame([np.percentile(group.glc, [90, 75, 50, 25, 10])], columns=['q90', 'q3', 'q2', 'q1', 'q10'])).reset_index().drop(columns=['level_1'])
+    # Group the readings by wall-clock time of day as integer nanoseconds rather than Python time objects,
+    # dropping any time zone first so the clocks changing doesn't shift the readings after the change
+    wall_time = group_frame['time'].dt.tz_localize(None) if group_frame['time'].dt.tz is not None else group_frame['time']
+    time_of_day = (wall_time - wall_time.dt.normalize()).to_numpy()
+    order = np.argsort(time_of_day, kind='stable')
+    times, starts = np.unique(time_of_day[order], return_index=True)
+    blocks = np.split(group_frame['glc'].to_numpy()[order], starts[1:])
+    amb_prof = pd.DataFrame([np.percentile(block, [90, 75, 50, 25, 10]) for block in blocks], columns=['q90', 'q3', 'q2', 'q1', 'q10'])
+    amb_prof.insert(0, 'time', (pd.Timestamp(0) + pd.to_timedelta(times)).time)
 
     # Set values for graph
     x = amb_prof['time'] #.astype(str)
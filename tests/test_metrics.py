@@ -127,4 +127,17 @@ def test_all_metrics():
     
     assert metrics.all_standard_metrics(df3, gap_size=5).to_dict() == {'ID': {0: 1001, 1: 1049, 2: 2017}, 'start_dt': {0: '2018-01-09 01:30:00', 1: '2018-04-06 12:17:00', 2: '2018-11-14 06:12:00'}, 'end_dt': {0: '2018-01-09 02:40:00', 1: '2018-04-06 14:22:00', 2: '2018-11-14 07:27:00'}, 'num_days': {0: 0.04861111111111111, 1: 0.08680555555555555, 2: 0.052083333333333336}, 'data_sufficiency': {0: 100, 1: 100, 2: 100}, 'avg_glc': {0: 8.298666666666666, 1: 3.8665384615384615, 2: 10.450624999999999}, 'ea1c': {0: 6.848218029350104, 1: 4.060716013546202, 2: 8.201650943396226}, 'sd': {0: 0.7703511876936079, 1: 2.283337806471381, 2: 0.24962555291209024}, 'cv': {0: 9.282830828570148, 1: 59.053797839705474, 2: 2.3886184119331646}, 'auc': {0: 8.310714285714285, 1: 3.7503999999999995, 2: 10.44533333333333}, 'lbgi': {0: 0.0, 1: 18.91588111178242, 2: 0.0}, 'hbgi': {0: 3.0453950982702223, 1: 0.6302309984464775, 2: 9.3347223623822}, 'mage': {0: 1.9399999999999995, 1: 7.539999999999999, 2: 0.7200000000000006}, 'tir_normal': {0: 100.0, 1: 23.076923076923077, 2: 0.0}, 'tir_norm_tight': {0: 26.666666666666668, 1: 15.384615384615385, 2: 0.0}, 'tir_lv1_hypo': {0: 0.0, 1: 19.230769230769234, 2: 0.0}, 'tir_lv2_hypo': {0: 0.0, 1: 53.84615384615385, 2: 0.0}, 'tir_lv1_hyper': {0: 0.0, 1: 3.8461538461538463, 2: 100.0}, 'tir_lv2_hyper': {0: 0.0, 1: 0.0, 2: 0.0}, 'gri': {0: 0.0, 1: 100.0, 2: 100.0}, 'number_hypos': {0: 0, 1: 1, 2: 0}, 'number_lv2_hypos': {0: 0, 1: 1, 2: 0}, 'number_prolonged_hypos': {0: 0, 1: 0, 2: 0}, 'avg_length_hypos': {0: 0, 1: '0 days 01:35:00', 2: 0}, 'total_time_in_hypo': {0: 0, 1: '0 days 01:35:00', 2: 0}, 'number_hypers': {0: 0, 1: 0, 2: 1}, 'number_lv2_hypers': {0: 0, 1: 0, 2: 0}, 'number_prolonged_hypers': {0: 0, 1: 0, 2: 0}, 'avg_length_hypers': {0: 0, 1: 0, 2: '0 days 01:15:00'}, 'total_time_in_hyper': {0: 0, 1: 0, 2: '0 days 01:15:00'}}
 
-    assert metrics.all_standard_metrics(df3, units='mmol', gap_size=5, lv1_hypo=5, lv2_hypo=3.9, lv1_hyper=13.9, lv2_hyper=15, event_mins=30, event_long_mins=45).to_dict() == {'ID': {0: 1001, 1: 1049, 2: 2017}, 'start_dt': {0: '2018-01-09 01:30:00', 1: '2018-04-06 12:17:00', 2: '2018-11-14 06:12:00'}, 'end_dt': {0: '2018-01-09 02:40:00', 1: '2018-04-06 14:22:00', 2: '2018-11-14 07:27:00'}, 'num_days': {0: 0.04861111111111111, 1: 0.08680555555555555, 2: 0.052083333333333336}, 'data_sufficiency': {0: 100, 1: 100, 2: 100}, 'avg_glc': {0: 8.298666666666666, 1: 3.8665384615384615, 2: 10.450624999999999}, 'ea1c': {0: 6.848218029350104, 1: 4.060716013546202, 2: 8.201650943396226}, 'sd': {0: 0.7703511876936079, 1: 2.283337806471381, 2: 0.24962555291209024}, 'cv': {0: 9.282830828570148, 1: 59.053797839705474, 2: 2.3886184119331646}, 'auc': {0: 8.310714285714285, 1: 3.7503999999999995, 2: 10.44533333333333}, 'lbgi': {0: 0.0, 1: 18.91588111178242, 2: 0.0}, 'hbgi': {0: 3.0453950982702223, 1: 0.6302309984464775, 2: 9.3347223623822}, 'mage': {0: 1.9399999999999995, 1: 7.539999999999999, 2: 0.7200000000000006}, 'tir_normal': {0: 100.0, 1: 23.076923076923077, 2: 0.0}, 'tir_norm_tight': {0: 26.666666666666668, 1: 15.384615384615385, 2: 0.0}, 'tir_lv1_hypo': {0: 0.0, 1: 19.230769230769234, 2: 0.0}, 'tir_lv2_hypo': {0: 0.0, 1: 53.84615384615385, 2: 0.0}, 'tir_lv1_hyper': {0: 0.0, 1: 3.8461538461538463, 2: 100.0}, 'tir_lv2_hyper': {0: 0.0, 1: 0.0, 2: 0.0}, 'gri': {0: 0.0, 1: 100.0, 2: 100.0}, 'number_hypos': {0: 0, 1: 1, 2: 0}, 'number_lv2_hypos': {0: 0, 1: 1, 2: 0}, 'number_prolonged_hypos': {0: 0, 1: 1, 2: 0}, 'avg_length_hypos': {0: 0, 1: '0 days 01:40:00', 2: 0}, 'total_time_in_hypo': {0: 0, 1: '0 days 01:40:00', 2: 0}, 'number_hypers': {0: 0, 1: 0, 2: 0}, 'number_lv2_hypers': {0: 0, 1: 0, 2: 0}, 'number_prolonged_hypers': {0: 0, 1: 0, 2: 0}, 'avg_length_hypers': {0: 0, 1: 0, 2: 0}, 'total_time_in_hyper': {0: 0, 1: 0, 2: 0}}
\ No newline at end of file
+    assert metrics.all_standard_metrics(df3, units='mmol', gap_size=5, lv1_hypo=5, lv2_hypo=3.9, lv1_hyper=13.9, lv2_hyper=15, event_mins=30, event_long_mins=45).to_dict() == {'ID': {0: 1001, 1: 1049, 2: 2017}, 'start_dt': {0: '2018-01-09 01:30:00', 1: '2018-04-06 12:17:00', 2: '2018-11-14 06:12:00'}, 'end_dt': {0: '2018-01-09 02:40:00', 1: '2018-04-06 14:22:00', 2: '2018-11-14 07:27:00'}, 'num_days': {0: 0.04861111111111111, 1: 0.08680555555555555, 2: 0.052083333333333336}, 'data_sufficiency': {0: 100, 1: 100, 2: 100}, 'avg_glc': {0: 8.298666666666666, 1: 3.8665384615384615, 2: 10.450624999999999}, 'ea1c': {0: 6.848218029350104, 1: 4.060716013546202, 2: 8.201650943396226}, 'sd': {0: 0.7703511876936079, 1: 2.283337806471381, 2: 0.24962555291209024}, 'cv': {0: 9.282830828570148, 1: 59.053797839705474, 2: 2.3886184119331646}, 'auc': {0: 8.310714285714285, 1: 3.7503999999999995, 2: 10.44533333333333}, 'lbgi': {0: 0.0, 1: 18.91588111178242, 2: 0.0}, 'hbgi': {0: 3.0453950982702223, 1: 0.6302309984464775, 2: 9.3347223623822}, 'mage': {0: 1.9399999999999995, 1: 7.539999999999999, 2: 0.7200000000000006}, 'tir_normal': {0: 100.0, 1: 23.076923076923077, 2: 0.0}, 'tir_norm_tight': {0: 26.666666666666668, 1: 15.384615384615385, 2: 0.0}, 'tir_lv1_hypo': {0: 0.0, 1: 19.230769230769234, 2: 0.0}, 'tir_lv2_hypo': {0: 0.0, 1: 53.84615384615385, 2: 0.0}, 'tir_lv1_hyper': {0: 0.0, 1: 3.8461538461538463, 2: 100.0}, 'tir_lv2_hyper': {0: 0.0, 1: 0.0, 2: 0.0}, 'gri': {0: 0.0, 1: 100.0, 2: 100.0}, 'number_hypos': {0: 0, 1: 1, 2: 0}, 'number_lv2_hypos': {0: 0, 1: 1, 2: 0}, 'number_prolonged_hypos': {0: 0, 1: 1, 2: 0}, 'avg_length_hypos': {0: 0, 1: '0 days 01:40:00', 2: 0}, 'total_time_in_hypo': {0: 0, 1: '0 days 01:40:00', 2: 0}, 'number_hypers': {0: 0, 1: 0, 2: 0}, 'number_lv2_hypers': {0: 0, 1: 0, 2: 0}, 'number_prolonged_hypers': {0: 0, 1: 0, 2: 0}, 'avg_length_hypers': {0: 0, 1: 0, 2: 0}, 'total_time_in_hyper': {0: 0, 1: 0, 2: 0}}
+
+
+def test_all_metrics_parallel():
+    # Processing the IDs in parallel gives the same results as processing them one after another
+    serial = metrics.all_standard_metrics(df3, gap_size=5)
+    parallel = metrics.all_standard_metrics(df3, gap_size=5, n_jobs=2)
+    assert parallel.to_dict() == serial.to_dict()
+
+
+def test_all_metrics_categorical_id():
+    # A categorical ID column gives the same results as the original IDs
+    df_cat = df3.astype({'ID': 'category'})
+    assert metrics.all_standard_metrics(df_cat, gap_size=5).to_dict() == metrics.all_standard_metrics(df3, gap_size=5).to_dict()
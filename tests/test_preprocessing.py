@@ -102,6 +102,13 @@ def test_set_time_frame():
     
     assert cut_df['time'].astype(str).tolist() == ['2021-03-23 04:11:00', '2021-03-23 04:26:00',
                                                     '2021-03-23 04:41:00', '2021-03-23 04:56:00'] 
+
+    # A window per ID
+    df_lib['ID'] = ['a', 'b'] * 4
+    cut_df = preprocessing.set_time_frame(df_lib, {'a': ['03-23-2021 04:11 AM', '03-23-2021 05:11 AM'],
+                                                   'b': ['03-23-2021 03:41 AM', '03-23-2021 04:26 AM']})
+    assert cut_df['time'].astype(str).tolist() == ['2021-03-23 03:56:00', '2021-03-23 04:11:00', '2021-03-23 04:26:00',
+                                                    '2021-03-23 04:41:00', '2021-03-23 05:11:00']
     
 
 # Test detect_units function
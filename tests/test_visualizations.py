@@ -40,4 +40,11 @@ df2['time'] = pd.to_datetime(df2['time'])
 df3 = pd.read_csv('tests/test_data/example1.csv')
 df3['time'] = pd.to_datetime(df3['time'], dayfirst=True)
 
-print(visualizations.agp(df1))
\ No newline at end of file
+print(visualizations.agp(df1))
+
+def test_agp_clock_change():
+    # Readings are profiled by wall-clock time of day, including after the clocks go forward
+    times = pd.date_range('2023-03-24', '2023-03-29', freq='5min', tz='Europe/London')
+    df = pd.DataFrame({'time': times, 'glc': times.hour * 4 + times.minute // 15})
+    for trace in visualizations.agp(df).data:
+        assert list(trace.y) == [x.hour * 4 + x.minute // 15 for x in trace.x]